@@ -9,17 +9,46 @@ Provides a dedicated analysis endpoint for real-time dashboard monitoring.
 """
 import json
 import os
+import re
 import logging
-from datetime import datetime
 
-from response_helpers import success_response, error_response, parse_body
+from response_helpers import success_response, error_response, parse_body, utc_now_iso
 from harassment_detector import detect_harassment, Severity
 from sentiment_analyzer import analyze_sentiment, Sentiment
-from db import execute_insert
+from db import enqueue_prepared, flush_writes
+from ai_client import TTLCache, get_client, stream_text
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Longer messages are truncated before analysis
+MAX_MESSAGE_LENGTH = 2000
+
+# analysis_logs.conversation_id is VARCHAR(255)
+MAX_CONVERSATION_ID_LENGTH = 255
+
+# JSON object embedded in Claude's analysis reply
+_JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+
+# Claude analyses by message text (reused across warm invocations)
+_ai_analysis_cache = TTLCache(maxsize=512, ttl=300)
+
+# SQS client for write-behind analytics logging (reused across warm invocations)
+_sqs_client = None
+
+
+# Combined risk lookup table (rows: harassment severity, columns: sentiment)
+_SEVERITY_INDEX = {"critical": 0, "high": 1, "medium": 2, "low": 3, "none": 4}
+_SENTIMENT_INDEX = {"anger": 0, "negative": 1, "neutral": 2, "positive": 3}
+_RISK_MATRIX = (
+    # anger       negative    neutral     positive
+    ("critical", "critical", "critical", "high"),    # critical
+    ("critical", "high",     "high",     "medium"),  # high
+    ("high",     "medium",   "medium",   "low"),     # medium
+    ("medium",   "medium",   "low",      "low"),     # low
+    ("medium",   "low",      "none",     "none"),    # none
+)
+
 
 def _calculate_combined_risk(harassment_severity: str, sentiment: str) -> str:
     """
@@ -33,29 +62,11 @@ def _calculate_combined_risk(harassment_severity: str, sentiment: str) -> str:
         low                  |  🟡   |    🟡    |   🟢    |    🟢
         none                 |  🟡   |    🟢    |   🟢    |    🟢
     """
-    risk_matrix = {
-        ("critical", "anger"): "critical",
-        ("critical", "negative"): "critical",
-        ("critical", "neutral"): "critical",
-        ("critical", "positive"): "high",
-        ("high", "anger"): "critical",
-        ("high", "negative"): "high",
-        ("high", "neutral"): "high",
-        ("high", "positive"): "medium",
-        ("medium", "anger"): "high",
-        ("medium", "negative"): "medium",
-        ("medium", "neutral"): "medium",
-        ("medium", "positive"): "low",
-        ("low", "anger"): "medium",
-        ("low", "negative"): "medium",
-        ("low", "neutral"): "low",
-        ("low", "positive"): "low",
-        ("none", "anger"): "medium",
-        ("none", "negative"): "low",
-        ("none", "neutral"): "none",
-        ("none", "positive"): "none",
-    }
-    return risk_matrix.get((harassment_severity, sentiment), "low")
+    row = _SEVERITY_INDEX.get(harassment_severity)
+    col = _SENTIMENT_INDEX.get(sentiment)
+    if row is None or col is None:
+        return "low"
+    return _RISK_MATRIX[row][col]
 
 
 def _ai_enhanced_analysis(message: str) -> dict | None:
@@ -63,15 +74,17 @@ def _ai_enhanced_analysis(message: str) -> dict | None:
     Use Claude Opus 4.6 for nuanced harassment analysis.
     Returns structured analysis or None if unavailable.
     """
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
+    if not os.environ.get("ANTHROPIC_API_KEY"):
         return None
 
-    try:
-        import anthropic
+    cached = _ai_analysis_cache.get(message)
+    if cached is not None:
+        return cached
 
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
+    try:
+        client = get_client()
+        result_text = stream_text(
+            client,
             model="claude-sonnet-4-20250514",
             max_tokens=256,
             system=(
@@ -83,18 +96,78 @@ def _ai_enhanced_analysis(message: str) -> dict | None:
             ),
             messages=[{"role": "user", "content": f"分析対象メッセージ: {message}"}],
         )
-        result_text = response.content[0].text
         # Extract JSON from response
-        import re
-        json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+        json_match = _JSON_OBJECT_PATTERN.search(result_text)
         if json_match:
-            return json.loads(json_match.group())
+            analysis = json.loads(json_match.group())
+            _ai_analysis_cache.set(message, analysis)
+            return analysis
     except Exception as e:
         logger.warning("AI analysis failed: %s", e)
 
     return None
 
 
+def _get_sqs_client():
+    """Get or create the SQS client (singleton per Lambda container)."""
+    global _sqs_client
+    if _sqs_client is None:
+        import boto3
+
+        _sqs_client = boto3.client("sqs")
+    return _sqs_client
+
+
+def _normalize_conversation_id(value) -> str:
+    """
+    Coerce a client-supplied conversation_id into a storable string.
+
+    Non-scalar values (objects, arrays, null) become "unknown" and long
+    values are truncated, so a bad request can't fail a batched insert.
+    """
+    if isinstance(value, (str, int, float)):
+        return str(value)[:MAX_CONVERSATION_ID_LENGTH]
+    return "unknown"
+
+
+def _persist_analysis_log(row: dict) -> None:
+    """
+    Persist one analysis_logs row.
+
+    When ANALYSIS_LOG_QUEUE_URL is set the row is sent to SQS and written in
+    bulk by the log_writer function; otherwise it is queued for the
+    container's background DB writer (see db.flush_writes).
+    """
+    queue_url = os.environ.get("ANALYSIS_LOG_QUEUE_URL")
+    if queue_url:
+        _get_sqs_client().send_message(
+            QueueUrl=queue_url,
+            MessageBody=json.dumps(row, ensure_ascii=False),
+        )
+        return
+
+    enqueue_prepared(
+        "analysis_log_insert",
+        """
+        INSERT INTO analysis_logs (
+            conversation_id, message_text, harassment_severity,
+            sentiment, combined_risk, ai_enhanced, created_at
+        )
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING id
+        """,
+        (
+            row["conversation_id"],
+            row["message_text"],
+            row["harassment_severity"],
+            row["sentiment"],
+            row["combined_risk"],
+            row["ai_enhanced"],
+            row["created_at"],
+        ),
+    )
+
+
 def lambda_handler(event, context):
     """
     Main Lambda handler for POST /api/analyze.
@@ -105,7 +178,7 @@ def lambda_handler(event, context):
     3. Run rule-based sentiment analysis
     4. (Optional) AI-enhanced analysis for deeper context
     5. Calculate combined risk level
-    6. Persist analytics to RDS
+    6. Persist analytics to RDS (background writer or the SQS log queue)
     7. Return analysis results
     """
     logger.info("Analyze function invoked")
@@ -114,11 +187,12 @@ def lambda_handler(event, context):
     if not body:
         return error_response("Request body is required", 400)
 
-    message = body.get("message", "").strip()
+    # Cap length once at entry to bound worst-case scan cost downstream
+    message = body.get("message", "").strip()[:MAX_MESSAGE_LENGTH]
     if not message:
         return error_response("Message is required", 400)
 
-    conversation_id = body.get("conversation_id", "unknown")
+    conversation_id = _normalize_conversation_id(body.get("conversation_id", "unknown"))
     use_ai = body.get("use_ai", True)
 
     # Rule-based analysis
@@ -136,26 +210,19 @@ def lambda_handler(event, context):
         sentiment.sentiment.value,
     )
 
-    # Persist to database
+    analyzed_at = utc_now_iso()
+
+    # Persist to database (or queue for the batched log writer)
     try:
-        execute_insert(
-            """
-            INSERT INTO analysis_logs (
-                conversation_id, message_text, harassment_severity,
-                sentiment, combined_risk, ai_enhanced, created_at
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-            RETURNING id
-            """,
-            (
-                conversation_id,
-                message[:500],  # Truncate for storage
-                harassment.severity.value,
-                sentiment.sentiment.value,
-                combined_risk,
-                ai_analysis is not None,
-            ),
-        )
+        _persist_analysis_log({
+            "conversation_id": conversation_id,
+            "message_text": message[:500],  # Truncate for storage
+            "harassment_severity": harassment.severity.value,
+            "sentiment": sentiment.sentiment.value,
+            "combined_risk": combined_risk,
+            "ai_enhanced": ai_analysis is not None,
+            "created_at": analyzed_at,
+        })
     except Exception as e:
         logger.error("Database write failed (non-blocking): %s", e)
 
@@ -165,7 +232,7 @@ def lambda_handler(event, context):
         "sentiment": sentiment.to_dict(),
         "combined_risk": combined_risk,
         "ai_analysis": ai_analysis,
-        "analyzed_at": datetime.utcnow().isoformat(),
+        "analyzed_at": analyzed_at,
     }
 
     # Add alert flags
@@ -183,4 +250,6 @@ def lambda_handler(event, context):
             "severity": harassment.severity.value,
         }
 
+    # Make sure queued writes finish before Lambda freezes the container
+    flush_writes()
     return success_response(result)
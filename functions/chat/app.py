@@ -10,19 +10,31 @@ falls back to comprehensive rule-based response engine.
 """
 import json
 import os
+import re
 import uuid
 import logging
-from datetime import datetime
+from functools import lru_cache
 
-from response_helpers import success_response, error_response, parse_body
-from harassment_detector import detect_harassment
-from sentiment_analyzer import analyze_sentiment, Sentiment
+from response_helpers import success_response, error_response, parse_body, utc_now_iso
+from harassment_detector import detect_harassment, HarassmentResult
+from sentiment_analyzer import analyze_sentiment, Sentiment, SentimentResult
 from handoff import build_handoff_context
-from db import execute_insert, execute_query
+from ai_client import TTLCache, get_client, stream_text
+from db import enqueue_prepared, flush_writes
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Longer messages are truncated before analysis
+MAX_MESSAGE_LENGTH = 2000
+
+# Most recent history messages sent to Claude for context
+AI_HISTORY_MESSAGES = 10
+
+# Rule matches scoring above this (matched keyword length / message length)
+# are answered directly without calling Claude
+RULE_CONFIDENCE_THRESHOLD = 0.15
+
 
 # ── Rule-based AI response engine ─────────────────────────────────────────────
 
@@ -80,25 +92,95 @@ DEFAULT_RESPONSE = (
 )
 
 
-def _generate_rule_based_response(message: str) -> str:
-    """Generate a response using rule-based pattern matching."""
+# Claude replies to history-less messages (reused across warm invocations)
+_ai_response_cache = TTLCache(maxsize=512, ttl=300)
+
+# Keyword → index of the first rule that lists it (lower index = higher priority)
+_RULE_INDEX: dict[str, int] = {}
+for _index, (_keywords, _) in enumerate(RESPONSE_RULES):
+    for _kw in _keywords:
+        _RULE_INDEX.setdefault(_kw, _index)
+
+# All keywords in one pattern, ordered by rule priority. The lookahead makes
+# every position a candidate, so overlapping keywords (e.g. "hi" in "shipping")
+# are found exactly like the substring checks they replace.
+_RULE_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(kw) for kw in sorted(_RULE_INDEX, key=_RULE_INDEX.get)) + "))"
+)
+
+
+def _is_confident_match(text: str, keyword: str, start: int) -> bool:
+    """
+    True if a keyword hit can count toward the confidence score.
+
+    ASCII keywords must stand on word boundaries, so "hi" inside "nothing"
+    or "which" picks the rule but does not make it confident.
+    """
+    if not keyword.isascii():
+        return True
+    end = start + len(keyword)
+    before = text[start - 1] if start > 0 else " "
+    after = text[end] if end < len(text) else " "
+    return not any(char.isascii() and char.isalnum() for char in (before, after))
+
+
+@lru_cache(maxsize=1024)
+def _generate_rule_based_response(message: str) -> tuple[str, float]:
+    """
+    Generate a response using rule-based pattern matching.
+
+    Returns:
+        (response, score) where score is the length of the longest keyword
+        matched for the chosen rule divided by the message length
+        (0.0 for the default response). ASCII keywords found inside a
+        longer word select the rule but score 0.
+    """
     message_lower = message.lower()
-    for keywords, response in RESPONSE_RULES:
-        if any(kw in message_lower for kw in keywords):
-            return response
-    return DEFAULT_RESPONSE
+    matched = None
+    longest = 0
+    for m in _RULE_PATTERN.finditer(message_lower):
+        keyword = m.group(1)
+        index = _RULE_INDEX[keyword]
+        length = len(keyword) if _is_confident_match(message_lower, keyword, m.start()) else 0
+        if matched is None or index < matched:
+            matched, longest = index, length
+        elif index == matched:
+            longest = max(longest, length)
+    if matched is None:
+        return DEFAULT_RESPONSE, 0.0
+    return RESPONSE_RULES[matched][1], longest / len(message_lower)
+
+
+def _build_ai_history(history: list) -> list[dict]:
+    """Repack the last AI_HISTORY_MESSAGES history entries as Messages API turns."""
+    return [
+        {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+        for msg in history[-AI_HISTORY_MESSAGES:]
+        if isinstance(msg, dict)
+    ]
 
 
 def _generate_ai_response(message: str, conversation_history: list[dict]) -> str:
-    """Generate a response using Claude Opus 4.6 API."""
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-    if not api_key:
-        return _generate_rule_based_response(message)
+    """
+    Generate a response using Claude Opus 4.6 API.
 
-    try:
-        import anthropic
+    ``conversation_history`` must already be in Messages API form
+    (see _build_ai_history).
+
+    First-turn replies (no history) are cached briefly, so bursts of the
+    same boilerplate message reuse one Claude response.
+    """
+    if not os.environ.get("ANTHROPIC_API_KEY"):
+        return _generate_rule_based_response(message)[0]
 
-        client = anthropic.Anthropic(api_key=api_key)
+    cacheable = not conversation_history
+    if cacheable:
+        cached = _ai_response_cache.get(message)
+        if cached is not None:
+            return cached
+
+    try:
+        client = get_client()
         system_prompt = (
             "あなたはカスタマーサポートAIアシスタントです。"
             "日本語で丁寧に、かつ迅速に対応してください。"
@@ -106,25 +188,83 @@ def _generate_ai_response(message: str, conversation_history: list[dict]) -> str
             "回答は簡潔かつ具体的にしてください（200文字以内推奨）。"
         )
 
-        messages = []
-        for msg in conversation_history[-10:]:  # Last 10 messages for context
-            messages.append({
-                "role": msg.get("role", "user"),
-                "content": msg.get("content", ""),
-            })
-        messages.append({"role": "user", "content": message})
+        messages = conversation_history + [{"role": "user", "content": message}]
 
-        response = client.messages.create(
+        response_text = stream_text(
+            client,
             model="claude-sonnet-4-20250514",
             max_tokens=512,
             system=system_prompt,
             messages=messages,
         )
-        return response.content[0].text
+        if not response_text:
+            return _generate_rule_based_response(message)[0]
+        if cacheable:
+            _ai_response_cache.set(message, response_text)
+        return response_text
 
     except Exception as e:
         logger.warning("Claude API call failed, falling back to rule-based: %s", e)
-        return _generate_rule_based_response(message)
+        return _generate_rule_based_response(message)[0]
+
+
+# ── Persistence ───────────────────────────────────────────────────────────────
+
+def _persist_turn(
+    conversation_id: str,
+    message: str,
+    ai_response: str,
+    sentiment: SentimentResult,
+    harassment: HarassmentResult,
+) -> None:
+    """Queue the chat turn for the background DB writer (one prepared statement)."""
+    try:
+        if harassment.is_harassment:
+            # Save both messages and the harassment event linked to the user message
+            enqueue_prepared(
+                "chat_turn_with_harassment_insert",
+                """
+                WITH ins AS (
+                    INSERT INTO messages (conversation_id, role, content, sentiment, harassment_severity, created_at)
+                    VALUES ($1, 'user', $2, $3, $4, NOW()),
+                           ($1, 'assistant', $5, NULL, NULL, NOW())
+                    RETURNING id, role
+                )
+                INSERT INTO harassment_events (conversation_id, message_id, severity, categories, matched_patterns, created_at)
+                SELECT $1, id, $4, $6::jsonb, $7::jsonb, NOW()
+                FROM ins WHERE role = 'user'
+                RETURNING id
+                """,
+                (
+                    conversation_id,
+                    message,
+                    sentiment.sentiment.value,
+                    harassment.severity.value,
+                    ai_response,
+                    json.dumps(harassment.categories),
+                    json.dumps(harassment.matched_patterns),
+                ),
+            )
+        else:
+            # Save user message and AI response
+            enqueue_prepared(
+                "chat_turn_insert",
+                """
+                INSERT INTO messages (conversation_id, role, content, sentiment, harassment_severity, created_at)
+                VALUES ($1, 'user', $2, $3, $4, NOW()),
+                       ($1, 'assistant', $5, NULL, NULL, NOW())
+                RETURNING id
+                """,
+                (
+                    conversation_id,
+                    message,
+                    sentiment.sentiment.value,
+                    harassment.severity.value,
+                    ai_response,
+                ),
+            )
+    except Exception as e:
+        logger.error("Database write failed (non-blocking): %s", e)
 
 
 # ── Lambda Handler ────────────────────────────────────────────────────────────
@@ -137,9 +277,9 @@ def lambda_handler(event, context):
     1. Parse incoming message
     2. Detect harassment
     3. Analyze sentiment
-    4. Generate AI response (Claude or rule-based)
-    5. Check if handoff needed
-    6. Persist to RDS
+    4. Generate AI response (rule-based when confident, else Claude)
+    5. Persist to RDS (background writer, flushed before returning)
+    6. Check if handoff needed
     7. Return response
     """
     logger.info("Chat function invoked")
@@ -149,13 +289,15 @@ def lambda_handler(event, context):
     if not body:
         return error_response("Request body is required", 400)
 
-    message = body.get("message", "").strip()
+    # Cap length once at entry to bound worst-case scan cost downstream
+    message = body.get("message", "").strip()[:MAX_MESSAGE_LENGTH]
     if not message:
         return error_response("Message is required", 400)
 
     conversation_id = body.get("conversation_id", str(uuid.uuid4()))
     customer_name = body.get("customer_name")
-    history = body.get("history", [])
+    history = body.get("history") or []
+    ai_history = _build_ai_history(history)
 
     # Step 1: Harassment detection
     harassment = detect_harassment(message)
@@ -173,10 +315,19 @@ def lambda_handler(event, context):
         )
         needs_handoff = True
     else:
-        ai_response = _generate_ai_response(message, history)
+        rule_response, rule_score = _generate_rule_based_response(message)
+        if rule_score > RULE_CONFIDENCE_THRESHOLD:
+            logger.info("Response branch: rule (score=%.2f)", rule_score)
+            ai_response = rule_response
+        else:
+            logger.info("Response branch: ai (rule score=%.2f)", rule_score)
+            ai_response = _generate_ai_response(message, ai_history)
         needs_handoff = False
 
-    # Step 4: Build handoff context if needed
+    # Step 4: Queue the DB write for the background writer thread
+    _persist_turn(conversation_id, message, ai_response, sentiment, harassment)
+
+    # Step 5: Build handoff context if needed
     handoff_context = None
     if needs_handoff or sentiment.trigger_alert:
         handoff = build_handoff_context(
@@ -189,54 +340,15 @@ def lambda_handler(event, context):
         )
         handoff_context = handoff.to_dict()
 
-    # Step 5: Persist to database
-    try:
-        # Save user message
-        execute_insert(
-            """
-            INSERT INTO messages (conversation_id, role, content, sentiment, harassment_severity, created_at)
-            VALUES (%s, %s, %s, %s, %s, NOW())
-            RETURNING id
-            """,
-            (conversation_id, "user", message, sentiment.sentiment.value, harassment.severity.value),
-        )
-
-        # Save AI response
-        execute_insert(
-            """
-            INSERT INTO messages (conversation_id, role, content, created_at)
-            VALUES (%s, %s, %s, NOW())
-            RETURNING id
-            """,
-            (conversation_id, "assistant", ai_response),
-        )
-
-        # Log harassment event if detected
-        if harassment.is_harassment:
-            execute_insert(
-                """
-                INSERT INTO harassment_events (conversation_id, severity, categories, matched_patterns, created_at)
-                VALUES (%s, %s, %s, %s, NOW())
-                RETURNING id
-                """,
-                (
-                    conversation_id,
-                    harassment.severity.value,
-                    json.dumps(harassment.categories),
-                    json.dumps(harassment.matched_patterns),
-                ),
-            )
-
-    except Exception as e:
-        logger.error("Database write failed (non-blocking): %s", e)
-
-    # Step 6: Return response
-    return success_response({
+    # Step 6: Return response (wait for the write so it completes before Lambda freezes)
+    response = success_response({
         "conversation_id": conversation_id,
         "response": ai_response,
         "sentiment": sentiment.to_dict(),
         "harassment": harassment.to_dict(),
         "handoff": handoff_context,
         "needs_handoff": needs_handoff,
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_now_iso(),
     })
+    flush_writes()
+    return response
@@ -0,0 +1,77 @@
+"""
+Log Writer Lambda Function — Batched analytics persistence.
+Triggered by SQS (AnalysisLogQueue)
+
+Drains analysis_logs rows queued by the analyze function and writes each
+batch with a single multi-row INSERT instead of one round-trip per request.
+If the batch is rejected for bad data, rows are retried one at a time and
+only the failing messages are reported back to SQS (ReportBatchItemFailures);
+connection errors fail the whole batch so SQS redelivers it.
+"""
+import json
+import logging
+
+import psycopg2
+
+from db import execute_values_insert
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+ANALYSIS_LOG_COLUMNS = (
+    "conversation_id",
+    "message_text",
+    "harassment_severity",
+    "sentiment",
+    "combined_risk",
+    "ai_enhanced",
+    "created_at",
+)
+
+INSERT_QUERY = f"INSERT INTO analysis_logs ({', '.join(ANALYSIS_LOG_COLUMNS)}) VALUES %s"
+
+# Errors caused by a row's contents; anything else (e.g. OperationalError when
+# RDS is unreachable) would fail every row alike, so it is re-raised instead
+ROW_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+
+def lambda_handler(event, context):
+    """
+    Main Lambda handler for the analysis log queue.
+
+    Processes:
+    1. Decode queued rows (malformed records are logged and dropped)
+    2. Insert all rows in one transaction (execute_values, 500 rows/page)
+    3. On a data error, insert rows one at a time so one bad row can't sink the batch
+
+    Returns the messageIds that could not be written as batchItemFailures,
+    so SQS retries (and eventually dead-letters) only those messages.
+    """
+    records = event.get("Records", [])
+    logger.info("Log writer invoked with %d records", len(records))
+
+    message_ids = []
+    rows = []
+    for record in records:
+        try:
+            row = json.loads(record["body"])
+            rows.append(tuple(row[column] for column in ANALYSIS_LOG_COLUMNS))
+            message_ids.append(record["messageId"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error("Dropping malformed record %s: %s", record.get("messageId"), e)
+
+    failures = []
+    if rows:
+        try:
+            execute_values_insert(INSERT_QUERY, rows, page_size=500)
+        except ROW_ERRORS as e:
+            logger.warning("Batch insert of %d rows failed, retrying row by row: %s", len(rows), e)
+            for message_id, row in zip(message_ids, rows):
+                try:
+                    execute_values_insert(INSERT_QUERY, [row])
+                except ROW_ERRORS as row_error:
+                    logger.error("Failed to write record %s: %s", message_id, row_error)
+                    failures.append({"itemIdentifier": message_id})
+
+    logger.info("Wrote %d rows, %d failed", len(rows) - len(failures), len(failures))
+    return {"batchItemFailures": failures}
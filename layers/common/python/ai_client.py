@@ -0,0 +1,140 @@
+"""
+Anthropic (Claude Opus 4.6) API helpers shared by the Lambda functions.
+Reuses one client across warm Lambda invocations and streams responses with
+a dead-man timeout so a stalled connection aborts in seconds and callers can
+fall back to their rule-based engines.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Anthropic client (reused across warm invocations)
+_client = None
+
+# Max seconds to open the connection to the API
+STREAM_CONNECT_TIMEOUT_SECONDS = 3.0
+# Max seconds to wait for the next chunk (applied as the HTTP read timeout)
+STREAM_IDLE_TIMEOUT_SECONDS = 10.0
+# Max seconds for the whole generation (stays well under the Lambda timeout)
+STREAM_TOTAL_TIMEOUT_SECONDS = 20.0
+
+
+class StreamTimeoutError(TimeoutError):
+    """Raised when a streamed response exceeds its total time budget."""
+
+
+class TTLCache:
+    """
+    Small LRU cache whose entries expire after ``ttl`` seconds.
+
+    Kept in module globals, it survives across warm invocations so repeated
+    boilerplate messages can skip the Claude call.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+def get_client() -> Optional["anthropic.Anthropic"]:
+    """
+    Get or create the Anthropic client (singleton per Lambda container).
+
+    Reusing the client keeps its HTTP connection pool alive, so warm
+    invocations skip the TCP + TLS handshake. Returns None when
+    ANTHROPIC_API_KEY is not set.
+    """
+    global _client
+    if _client is None:
+        api_key = os.environ.get("ANTHROPIC_API_KEY")
+        if not api_key:
+            return None
+        import anthropic
+
+        logger.info("Creating Anthropic client")
+        _client = anthropic.Anthropic(api_key=api_key)
+    return _client
+
+
+def _stream_timeout(idle_timeout: float, total_timeout: float) -> "httpx.Timeout":
+    """Build the per-request HTTP timeout, with every phase capped by the total budget."""
+    import httpx
+
+    read_timeout = min(idle_timeout, total_timeout)
+    return httpx.Timeout(read_timeout, connect=min(STREAM_CONNECT_TIMEOUT_SECONDS, read_timeout))
+
+
+def stream_text(
+    client,
+    idle_timeout: float = STREAM_IDLE_TIMEOUT_SECONDS,
+    total_timeout: float = STREAM_TOTAL_TIMEOUT_SECONDS,
+    **params,
+) -> str:
+    """
+    Stream a Messages API response and return the concatenated text.
+
+    The request is made without SDK retries (a retried timeout would blow
+    through the budget), and a watchdog closes the stream once total_timeout
+    has elapsed so a stall between chunks cannot overrun it.
+
+    Args:
+        client: An ``anthropic.Anthropic`` client.
+        idle_timeout: Seconds allowed between chunks before the read times out.
+        total_timeout: Seconds allowed for the whole response.
+        **params: Keyword arguments for ``client.messages.stream``.
+
+    Raises:
+        StreamTimeoutError: If the response does not finish within total_timeout.
+        anthropic.APITimeoutError: If no chunk arrives within idle_timeout.
+    """
+    deadline = time.monotonic() + total_timeout
+    timeout = _stream_timeout(idle_timeout, total_timeout)
+    expired = threading.Event()
+    chunks = []
+    with client.with_options(max_retries=0).messages.stream(timeout=timeout, **params) as stream:
+
+        def _abort() -> None:
+            expired.set()
+            stream.close()
+
+        watchdog = threading.Timer(max(deadline - time.monotonic(), 0.0), _abort)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            for text in stream.text_stream:
+                chunks.append(text)
+        except Exception as e:
+            if expired.is_set():
+                raise StreamTimeoutError(f"Claude stream exceeded {total_timeout:.0f}s") from e
+            raise
+        finally:
+            watchdog.cancel()
+    if expired.is_set():
+        # Closing the stream can also end iteration quietly with partial text
+        raise StreamTimeoutError(f"Claude stream exceeded {total_timeout:.0f}s")
+    return "".join(chunks)
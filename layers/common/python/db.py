@@ -1,21 +1,35 @@
 """
 Database connection pool for AWS Lambda + RDS PostgreSQL.
 Uses connection reuse across warm Lambda invocations.
+Writes can be queued to a per-container background writer thread, which
+batches them into one transaction; the pool is thread-safe for that reason.
 """
 import os
 import json
+import time
+import queue
 import logging
+import threading
+import weakref
 from contextlib import contextmanager
 from typing import Any, Generator, Optional
 
-import psycopg2
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_batch, execute_values
 
 logger = logging.getLogger(__name__)
 
 # Connection pool (reused across warm invocations)
-_connection_pool: Optional[pool.SimpleConnectionPool] = None
+_connection_pool: Optional[pool.ThreadedConnectionPool] = None
+
+# Names of server-side prepared statements per pooled connection
+_prepared_statements: "weakref.WeakKeyDictionary[Any, set[str]]" = weakref.WeakKeyDictionary()
+
+# Background write queue (drained by one writer thread per warm container)
+WRITE_BATCH_SIZE = 50
+_write_queue: "queue.Queue[tuple[str, str, tuple]]" = queue.Queue(maxsize=10000)
+_writer_thread: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
 
 
 def _get_db_config() -> dict:
@@ -26,18 +40,28 @@ def _get_db_config() -> dict:
         "dbname": os.environ.get("DB_NAME", "customer_support"),
         "user": os.environ.get("DB_USER", "csadmin"),
         "password": os.environ.get("DB_PASSWORD", ""),
+        # Fail fast on unreachable DB; keepalives stop NAT/firewalls silently
+        # dropping idle connections in warm containers
+        "connect_timeout": 3,
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        "keepalives_interval": 10,
+        "keepalives_count": 3,
+        "application_name": f"lambda-{os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')}",
     }
 
 
-def get_pool() -> pool.SimpleConnectionPool:
+def get_pool() -> pool.ThreadedConnectionPool:
     """Get or create the connection pool (singleton per Lambda container)."""
     global _connection_pool
     if _connection_pool is None or _connection_pool.closed:
         config = _get_db_config()
         logger.info("Creating new connection pool to %s:%s/%s", config["host"], config["port"], config["dbname"])
-        _connection_pool = pool.SimpleConnectionPool(
+        # A container serves one invocation at a time: one connection for the
+        # handler and one for the background writer thread
+        _connection_pool = pool.ThreadedConnectionPool(
             minconn=1,
-            maxconn=5,
+            maxconn=2,
             **config,
         )
     return _connection_pool
@@ -78,14 +102,129 @@ def execute_query(query: str, params: tuple = None) -> list[dict]:
         return cur.fetchall()
 
 
-def execute_insert(query: str, params: tuple = None) -> Optional[dict]:
-    """Execute an INSERT/UPDATE query with RETURNING clause."""
-    with get_cursor() as cur:
+def execute_insert(query: str, params: tuple = None, cursor_factory=None) -> Optional[Any]:
+    """
+    Execute an INSERT/UPDATE query, returning the first RETURNING row if any.
+
+    Rows are plain tuples by default; pass ``cursor_factory=RealDictCursor``
+    if the caller needs the returned row keyed by column name.
+    """
+    with get_cursor(cursor_factory=cursor_factory) as cur:
         cur.execute(query, params)
+        # description is None when the statement has no RETURNING clause
+        return cur.fetchone() if cur.description is not None else None
+
+
+def _ensure_prepared(conn, cur, name: str, query: str) -> None:
+    """
+    PREPARE ``query`` as ``name`` unless this connection already has it.
+
+    ``query`` uses PostgreSQL's $1, $2, ... placeholders. Later EXECUTEs skip
+    parsing and planning. Prepared statements survive transaction rollbacks,
+    so the name is remembered as soon as PREPARE succeeds.
+    """
+    prepared = _prepared_statements.setdefault(conn, set())
+    if name not in prepared:
+        cur.execute(f"PREPARE {name} AS {query}")
+        prepared.add(name)
+
+
+def _execute_sql(name: str, param_count: int) -> str:
+    """Build the EXECUTE statement for a prepared statement."""
+    if not param_count:
+        return f"EXECUTE {name}"
+    return f"EXECUTE {name} ({', '.join(['%s'] * param_count)})"
+
+
+def execute_values_insert(
+    query: str,
+    rows: list[tuple],
+    template: Optional[str] = None,
+    page_size: int = 100,
+    fetch: bool = False,
+) -> list:
+    """
+    Execute a multi-row INSERT in a single statement.
+
+    The query must contain one ``VALUES %s`` placeholder, which is expanded to
+    up to ``page_size`` rows per statement; all pages share one transaction
+    and one commit. Set ``fetch=True`` to return the RETURNING rows.
+    """
+    with get_cursor(cursor_factory=None) as cur:
+        result = execute_values(cur, query, rows, template=template, page_size=page_size, fetch=fetch)
+        return result or []
+
+
+def enqueue_prepared(name: str, query: str, params: tuple = ()) -> None:
+    """
+    Queue a prepared-statement write for the background writer thread.
+
+    Returns immediately. Call flush_writes() before the handler returns so
+    the write completes before Lambda freezes the container.
+
+    Raises:
+        queue.Full: If the write queue is full.
+    """
+    _start_writer()
+    _write_queue.put_nowait((name, query, params))
+
+
+def flush_writes(timeout: float = 5.0) -> bool:
+    """Wait until all queued writes are done. Returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    with _write_queue.all_tasks_done:
+        while _write_queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning("Timed out flushing %d queued writes", _write_queue.unfinished_tasks)
+                return False
+            _write_queue.all_tasks_done.wait(remaining)
+    return True
+
+
+def _start_writer() -> None:
+    """Start the background writer thread (once per Lambda container)."""
+    global _writer_thread
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _writer_thread.start()
+
+
+def _writer_loop() -> None:
+    """Drain the write queue, writing up to WRITE_BATCH_SIZE rows per transaction."""
+    while True:
+        batch = [_write_queue.get()]
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
         try:
-            return cur.fetchone()
-        except psycopg2.ProgrammingError:
-            return None
+            _write_batch(batch)
+        except Exception as e:
+            logger.error("Background DB write failed (%d rows dropped): %s", len(batch), e)
+        finally:
+            for _ in batch:
+                _write_queue.task_done()
+
+
+def _write_batch(batch: list[tuple[str, str, tuple]]) -> None:
+    """Write queued rows in one transaction, batching rows per prepared statement."""
+    grouped: dict[str, tuple[str, list[tuple]]] = {}
+    for name, query, params in batch:
+        grouped.setdefault(name, (query, []))[1].append(params)
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            for name, (query, rows) in grouped.items():
+                _ensure_prepared(conn, cur, name, query)
+                execute_batch(cur, _execute_sql(name, len(rows[0])), rows, page_size=WRITE_BATCH_SIZE)
+        finally:
+            cur.close()
 
 
 def check_health() -> dict:
@@ -4,9 +4,11 @@ Collects conversation metadata and summarizes context for human agents.
 """
 import re
 import logging
+from bisect import bisect_right
+from itertools import accumulate
 from dataclasses import dataclass
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
@@ -41,37 +43,58 @@ class HandoffContext:
         }
 
 
+# ── Pattern Definitions ──────────────────────────────────────────────────────
+
+ORDER_NUMBER_PATTERN = re.compile(
+    r"(?:注文番号|オーダー|order\s*(?:number|#|no\.?))\s*[：:]?\s*([A-Z0-9\-]+)",
+    re.IGNORECASE,
+)
+
+ISSUE_PATTERNS = {
+    "配送問題": [r"届かない|届いていない|配送.*遅|配達.*来ない|発送.*まだ"],
+    "品質問題": [r"壊れ|破損|不良|傷|汚れ|欠陥|故障|動かない"],
+    "返品・返金": [r"返品|返金|キャンセル|取り消し|払い戻し"],
+    "アカウント問題": [r"ログイン.*できない|パスワード|アカウント.*ロック"],
+    "料金問題": [r"請求.*おかしい|二重.*課金|料金.*違う|値段.*間違"],
+    "対応不満": [r"対応.*悪い|何度も.*問い合わせ|たらい回し|返事.*ない"],
+}
+
+# All issue categories in one pattern; group names map back to categories.
+# The lookahead tries every position, so matches of different categories may
+# overlap (e.g. "返事が届かない" yields both 対応不満 and 配送問題).
+_ISSUE_GROUPS = {f"_CAT{i}": issue_name for i, issue_name in enumerate(ISSUE_PATTERNS)}
+_ISSUE_ORDER = {issue_name: i for i, issue_name in enumerate(ISSUE_PATTERNS)}
+_ISSUE_PATTERN = re.compile(
+    "(?="
+    + "|".join(
+        f"(?P<_CAT{i}>{'|'.join(patterns)})"
+        for i, patterns in enumerate(ISSUE_PATTERNS.values())
+    )
+    + ")"
+)
+
+
 def _extract_order_numbers(messages: list[dict]) -> list[str]:
     """Extract order numbers from conversation messages."""
-    order_pattern = r"(?:注文番号|オーダー|order\s*(?:number|#|no\.?))\s*[：:]?\s*([A-Z0-9\-]+)"
-    found = set()
-    for msg in messages:
-        text = msg.get("content", "")
-        matches = re.findall(order_pattern, text, re.IGNORECASE)
-        found.update(matches)
-    return sorted(found)
+    # One scan over all messages; NUL cannot be matched by \s or the
+    # order-number charset, so matches never span two messages.
+    text = "\x00".join(msg.get("content", "") for msg in messages)
+    return sorted(set(ORDER_NUMBER_PATTERN.findall(text)))
 
 
 def _extract_issues(messages: list[dict]) -> list[str]:
     """Extract detected issues from customer messages."""
-    issue_patterns = {
-        "配送問題": [r"届かない|届いていない|配送.*遅|配達.*来ない|発送.*まだ"],
-        "品質問題": [r"壊れ|破損|不良|傷|汚れ|欠陥|故障|動かない"],
-        "返品・返金": [r"返品|返金|キャンセル|取り消し|払い戻し"],
-        "アカウント問題": [r"ログイン.*できない|パスワード|アカウント.*ロック"],
-        "料金問題": [r"請求.*おかしい|二重.*課金|料金.*違う|値段.*間違"],
-        "対応不満": [r"対応.*悪い|何度も.*問い合わせ|たらい回し|返事.*ない"],
-    }
-    issues = []
-    for msg in messages:
-        if msg.get("role") != "user":
-            continue
-        text = msg.get("content", "")
-        for issue_name, patterns in issue_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text) and issue_name not in issues:
-                    issues.append(issue_name)
-    return issues
+    texts = [msg.get("content", "") for msg in messages if msg.get("role") == "user"]
+    # One scan over all customer messages; "." never matches the newline
+    # separator, so matches never span two messages.
+    starts = list(accumulate(len(text) + 1 for text in texts[:-1]))
+    first_seen: dict[str, int] = {}
+    for m in _ISSUE_PATTERN.finditer("\n".join(texts)):
+        issue_name = _ISSUE_GROUPS[m.lastgroup]
+        if issue_name not in first_seen:
+            first_seen[issue_name] = bisect_right(starts, m.start())
+    # Same order as a per-message scan: by first message, then category order
+    return sorted(first_seen, key=lambda name: (first_seen[name], _ISSUE_ORDER[name]))
 
 
 def _determine_priority(
@@ -168,6 +191,6 @@ def build_handoff_context(
         metadata={
             "total_messages": len(messages),
             "customer_messages": len([m for m in messages if m.get("role") == "user"]),
-            "handoff_timestamp": datetime.utcnow().isoformat(),
+            "handoff_timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
         },
     )
@@ -4,9 +4,20 @@ Rule-based + AI-enhanced (Claude Opus 4.6 / Gemini 3) analysis.
 """
 import re
 import logging
+from functools import lru_cache
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional, Sequence
+
+try:
+    from re import _parser as _sre_parser  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parser
+
+try:
+    import re2  # optional: google-re2 (linear-time matching for the fused gates)
+except ImportError:
+    re2 = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,13 +30,13 @@ class Severity(str, Enum):
     NONE = "none"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class HarassmentResult:
     is_harassment: bool
     severity: Severity
     confidence: float
-    matched_patterns: list[str]
-    categories: list[str]
+    matched_patterns: tuple[str, ...]
+    categories: tuple[str, ...]
     recommendation: str
 
     def to_dict(self) -> dict:
@@ -33,95 +44,269 @@ class HarassmentResult:
             "is_harassment": self.is_harassment,
             "severity": self.severity.value,
             "confidence": self.confidence,
-            "matched_patterns": self.matched_patterns,
-            "categories": self.categories,
+            "matched_patterns": list(self.matched_patterns),
+            "categories": list(self.categories),
             "recommendation": self.recommendation,
         }
 
 
 # ── Pattern Definitions ──────────────────────────────────────────────────────
+# Compiled once at import so each call skips the re module's pattern cache.
 
 CRITICAL_PATTERNS = [
     # Direct threats
-    (r"殺す|ころす|コロス", "death_threat"),
-    (r"死ね|しね|シネ", "death_wish"),
-    (r"爆破|放火|刺す", "violence_threat"),
-    (r"訴え(る|てやる)|裁判|弁護士呼ぶ", "legal_threat"),
-    (r"(上|部)長.*出せ.*殺|殺.*上.*出せ", "escalation_threat"),
+    (re.compile(r"殺す|ころす|コロス", re.IGNORECASE), "death_threat"),
+    (re.compile(r"死ね|しね|シネ", re.IGNORECASE), "death_wish"),
+    (re.compile(r"爆破|放火|刺す", re.IGNORECASE), "violence_threat"),
+    (re.compile(r"訴え(る|てやる)|裁判|弁護士呼ぶ", re.IGNORECASE), "legal_threat"),
+    (re.compile(r"(上|部)長.*出せ.*殺|殺.*上.*出せ", re.IGNORECASE), "escalation_threat"),
 ]
 
 HIGH_PATTERNS = [
     # Severe insults
-    (r"バカ|ばか|馬鹿", "insult_baka"),
-    (r"アホ|あほ|阿呆", "insult_aho"),
-    (r"カス|かす|クズ|くず|屑", "insult_kasu"),
-    (r"ゴミ|ごみ|ゴミクズ", "insult_gomi"),
-    (r"キチガイ|きちがい|基地外", "insult_kichigai"),
-    (r"ふざけるな|ふざけんな|ナメてる|舐めてる", "contempt"),
-    (r"能無し|無能|役立たず|使えない", "incompetence_insult"),
-    (r"ボケ|ぼけ|ドアホ", "insult_boke"),
-    (r"クソ|くそ|糞", "insult_kuso"),
-    (r"ブス|デブ|ハゲ|キモい|きもい", "appearance_insult"),
+    (re.compile(r"バカ|ばか|馬鹿", re.IGNORECASE), "insult_baka"),
+    (re.compile(r"アホ|あほ|阿呆", re.IGNORECASE), "insult_aho"),
+    (re.compile(r"カス|かす|クズ|くず|屑", re.IGNORECASE), "insult_kasu"),
+    (re.compile(r"ゴミ|ごみ|ゴミクズ", re.IGNORECASE), "insult_gomi"),
+    (re.compile(r"キチガイ|きちがい|基地外", re.IGNORECASE), "insult_kichigai"),
+    (re.compile(r"ふざけるな|ふざけんな|ナメてる|舐めてる", re.IGNORECASE), "contempt"),
+    (re.compile(r"能無し|無能|役立たず|使えない", re.IGNORECASE), "incompetence_insult"),
+    (re.compile(r"ボケ|ぼけ|ドアホ", re.IGNORECASE), "insult_boke"),
+    (re.compile(r"クソ|くそ|糞", re.IGNORECASE), "insult_kuso"),
+    (re.compile(r"ブス|デブ|ハゲ|キモい|きもい", re.IGNORECASE), "appearance_insult"),
 ]
 
 MEDIUM_PATTERNS = [
     # Aggressive demands / intimidation
-    (r"今すぐ|すぐに|直ちに|至急", "urgency_pressure"),
-    (r"責任.*取れ|責任者.*出せ|上の者", "escalation_demand"),
-    (r"金.*返せ|弁償しろ|賠償", "compensation_demand"),
-    (r"(SNS|ネット|Twitter|X).*晒す|拡散", "social_media_threat"),
-    (r"二度と.*使わない|解約.*してやる", "service_threat"),
-    (r"いい加減に|何回.*言え|何度も", "frustration_repeat"),
+    (re.compile(r"今すぐ|すぐに|直ちに|至急", re.IGNORECASE), "urgency_pressure"),
+    (re.compile(r"責任.*取れ|責任者.*出せ|上の者", re.IGNORECASE), "escalation_demand"),
+    (re.compile(r"金.*返せ|弁償しろ|賠償", re.IGNORECASE), "compensation_demand"),
+    (re.compile(r"(SNS|ネット|Twitter|X).*晒す|拡散", re.IGNORECASE), "social_media_threat"),
+    (re.compile(r"二度と.*使わない|解約.*してやる", re.IGNORECASE), "service_threat"),
+    (re.compile(r"いい加減に|何回.*言え|何度も", re.IGNORECASE), "frustration_repeat"),
 ]
 
 LOW_PATTERNS = [
     # Mild frustration
-    (r"困る|困って|不便", "frustration"),
-    (r"遅い|遅すぎ|待たされ", "complaint_slow"),
-    (r"分かりにくい|説明.*ない|不親切", "complaint_unclear"),
+    (re.compile(r"困る|困って|不便", re.IGNORECASE), "frustration"),
+    (re.compile(r"遅い|遅すぎ|待たされ", re.IGNORECASE), "complaint_slow"),
+    (re.compile(r"分かりにくい|説明.*ない|不親切", re.IGNORECASE), "complaint_unclear"),
 ]
 
+# Severities reported as harassment (LOW is mild frustration)
+_HARASSMENT_SEVERITIES = frozenset({Severity.CRITICAL, Severity.HIGH, Severity.MEDIUM})
+
+# Operator guidance per severity
+_RECOMMENDATIONS: dict[Severity, str] = {
+    Severity.CRITICAL: "即座に上席者へエスカレーション。通話録音を保存し、法務部門に報告してください。",
+    Severity.HIGH: "冷静に対応し、上席者への引き継ぎを準備してください。対応履歴を詳細に記録してください。",
+    Severity.MEDIUM: "落ち着いたトーンで対応を継続。感情的にならず、事実ベースで回答してください。",
+    Severity.LOW: "通常対応を継続。お客様の不満に寄り添いながら解決策を提示してください。",
+    Severity.NONE: "通常対応を継続してください。",
+}
+
+
+def _fuse(patterns: list[re.Pattern]):
+    """
+    Combine a bucket's patterns into one alternation used as a quick gate.
+
+    Compiled with RE2 when available (only ``search`` is used on gates);
+    falls back to ``re`` if RE2 is missing or rejects the syntax.
+    """
+    source = "|".join(f"(?:{pattern.pattern})" for pattern in patterns)
+    if re2 is not None:
+        try:
+            return re2.compile(f"(?i){source}")
+        except re2.error:
+            logger.warning("RE2 rejected harassment gate, using re: %s", source)
+    return re.compile(source, re.IGNORECASE)
+
+
+_ASCII_CHARS = "".join(map(chr, range(128)))
+_REPEATS = (_sre_parser.MAX_REPEAT, _sre_parser.MIN_REPEAT, getattr(_sre_parser, "POSSESSIVE_REPEAT", None))
+
+
+def _class_requires_non_ascii(items) -> bool:
+    """True if a parsed character class cannot match any ASCII character."""
+    members = []
+    for op, av in items:
+        if op is _sre_parser.LITERAL:
+            members.append(re.escape(chr(av)))
+        elif op is _sre_parser.RANGE:
+            members.append(f"{re.escape(chr(av[0]))}-{re.escape(chr(av[1]))}")
+        else:  # NEGATE, CATEGORY (\w, \d, ...): assume it can match ASCII
+            return False
+    return not re.search(f"[{''.join(members)}]", _ASCII_CHARS, re.IGNORECASE)
+
+
+def _sequence_requires_non_ascii(items) -> bool:
+    """True if some mandatory item of a parsed sequence needs a non-ASCII character."""
+    for op, av in items:
+        if op is _sre_parser.LITERAL:
+            required = _class_requires_non_ascii([(op, av)])
+        elif op is _sre_parser.IN:
+            required = _class_requires_non_ascii(av)
+        elif op is _sre_parser.SUBPATTERN:
+            required = _sequence_requires_non_ascii(av[-1])
+        elif op is _sre_parser.BRANCH:
+            required = all(_sequence_requires_non_ascii(branch) for branch in av[1])
+        elif op in _REPEATS:
+            required = av[0] >= 1 and _sequence_requires_non_ascii(av[2])
+        else:  # anchors, ".", lookarounds, backreferences, ...
+            required = False
+        if required:
+            return True
+    return False
+
+
+def _requires_non_ascii(source: str) -> bool:
+    """
+    True if every match of the pattern must contain a non-ASCII character.
+
+    Walks the parsed pattern, so groups, alternations and character classes
+    are handled by the re module itself. Conservative: anything it does not
+    understand is assumed to match ASCII, and literals are compared
+    case-insensitively.
+    """
+    return _sequence_requires_non_ascii(_sre_parser.parse(source))
+
+
+# Severity ranks: index = score, so max(score) gives the highest severity
+_SEVERITY_BY_SCORE = (Severity.NONE, Severity.LOW, Severity.MEDIUM, Severity.HIGH, Severity.CRITICAL)
+
+# All patterns as parallel arrays, ordered by descending severity
+_ALL_PATTERNS: list[re.Pattern] = []
+_ALL_CATEGORIES: list[str] = []
+_scores: list[int] = []
+
+# (fused gate, pattern indices): a bucket's patterns are only searched
+# individually when its gate matches, so clean text costs one scan per bucket
+_BUCKETS: list[tuple[Any, Sequence[int]]] = []
+# Same, limited to patterns that can match ASCII-only text
+_ASCII_BUCKETS: list[tuple[Any, Sequence[int]]] = []
+
+for _severity, _patterns in (
+    (Severity.CRITICAL, CRITICAL_PATTERNS),
+    (Severity.HIGH, HIGH_PATTERNS),
+    (Severity.MEDIUM, MEDIUM_PATTERNS),
+    (Severity.LOW, LOW_PATTERNS),
+):
+    _score = _SEVERITY_BY_SCORE.index(_severity)
+    _start = len(_ALL_PATTERNS)
+    for _pattern, _category in _patterns:
+        _ALL_PATTERNS.append(_pattern)
+        _ALL_CATEGORIES.append(_category)
+        _scores.append(_score)
+    _indices = range(_start, len(_ALL_PATTERNS))
+    _BUCKETS.append((_fuse([_ALL_PATTERNS[i] for i in _indices]), _indices))
+    _ascii_indices = [i for i in _indices if not _requires_non_ascii(_ALL_PATTERNS[i].pattern)]
+    if _ascii_indices:
+        _ASCII_BUCKETS.append((_fuse([_ALL_PATTERNS[i] for i in _ascii_indices]), _ascii_indices))
+
+# Score per pattern index; bytes indexing returns a small int without a dict lookup
+_ALL_SEVERITY_SCORES = bytes(_scores)
+
+# Shared result for empty / whitespace-only input (read-only)
+_EMPTY_RESULT = HarassmentResult(
+    is_harassment=False,
+    severity=Severity.NONE,
+    confidence=1.0,
+    matched_patterns=(),
+    categories=(),
+    recommendation="入力なし",
+)
 
+
+def _scan_generic(text: str) -> tuple[list[str], list[str], int]:
+    """
+    Run the pattern tables over ``text`` (table-driven reference version).
+
+    Returns (matched pattern sources, categories in match order, max score).
+    """
+    matched_patterns = []
+    categories: dict[str, None] = {}  # insertion-ordered set
+    max_score = 0
+
+    # Check all pattern groups (ASCII text skips patterns that need non-ASCII)
+    for gate, indices in _ASCII_BUCKETS if text.isascii() else _BUCKETS:
+        if not gate.search(text):
+            continue
+        for i in indices:
+            pattern = _ALL_PATTERNS[i]
+            if pattern.search(text):
+                matched_patterns.append(pattern.pattern)
+                categories[_ALL_CATEGORIES[i]] = None
+                max_score = max(max_score, _ALL_SEVERITY_SCORES[i])
+
+    return matched_patterns, list(categories), max_score
+
+
+def _build_scan_fast():
+    """
+    Generate a straight-line equivalent of _scan_generic from the tables.
+
+    Every gate, pattern, source string and category is bound as a global of
+    the generated function, so the hot path has no table indexing or loops.
+    """
+    namespace: dict[str, Any] = {}
+    lines = [
+        "def _scan_fast(text):",
+        "    matched = []",
+        "    categories = {}",
+        "    score = 0",
+    ]
+    for prefix, branch, buckets in (
+        ("_ASCII_GATE", "if text.isascii():", _ASCII_BUCKETS),
+        ("_GATE", "else:", _BUCKETS),
+    ):
+        lines.append(f"    {branch}")
+        lines.append("        pass")
+        for b, (gate, indices) in enumerate(buckets):
+            gate_name = f"{prefix}{b}"
+            namespace[gate_name] = gate
+            lines.append(f"        if {gate_name}.search(text):")
+            for i in indices:
+                namespace[f"_P{i}"] = _ALL_PATTERNS[i]
+                namespace[f"_S{i}"] = _ALL_PATTERNS[i].pattern
+                namespace[f"_C{i}"] = _ALL_CATEGORIES[i]
+                lines += [
+                    f"            if _P{i}.search(text):",
+                    f"                matched.append(_S{i})",
+                    f"                categories[_C{i}] = None",
+                    f"                if score < {_ALL_SEVERITY_SCORES[i]}:",
+                    f"                    score = {_ALL_SEVERITY_SCORES[i]}",
+                ]
+    lines.append("    return matched, list(categories), score")
+    exec(compile("\n".join(lines), "<harassment_scan>", "exec"), namespace)
+    return namespace["_scan_fast"]
+
+
+# Specialized scanner used by detect_harassment; must match _scan_generic
+_scan_fast = _build_scan_fast()
+_scan = _scan_fast
+
+
+@lru_cache(maxsize=4096)
 def detect_harassment(text: str) -> HarassmentResult:
     """
     Detect harassment in the given text using pattern matching.
 
+    Results are memoized per text (repeated boilerplate messages are common)
+    and shared between callers, so their sequence fields are tuples.
+
     Args:
         text: The user message to analyze.
 
     Returns:
         HarassmentResult with severity, confidence, and matched patterns.
     """
-    if not text or not text.strip():
-        return HarassmentResult(
-            is_harassment=False,
-            severity=Severity.NONE,
-            confidence=1.0,
-            matched_patterns=[],
-            categories=[],
-            recommendation="入力なし",
-        )
+    if not text or text.isspace():
+        return _EMPTY_RESULT
 
-    matched_patterns = []
-    categories = set()
-    max_severity = Severity.NONE
-    severity_scores = {Severity.CRITICAL: 4, Severity.HIGH: 3, Severity.MEDIUM: 2, Severity.LOW: 1, Severity.NONE: 0}
-
-    # Check all pattern groups
-    for patterns, severity in [
-        (CRITICAL_PATTERNS, Severity.CRITICAL),
-        (HIGH_PATTERNS, Severity.HIGH),
-        (MEDIUM_PATTERNS, Severity.MEDIUM),
-        (LOW_PATTERNS, Severity.LOW),
-    ]:
-        for pattern, category in patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                matched_patterns.append(pattern)
-                categories.add(category)
-                if severity_scores[severity] > severity_scores[max_severity]:
-                    max_severity = severity
-
-    is_harassment = max_severity in (Severity.CRITICAL, Severity.HIGH, Severity.MEDIUM)
+    matched_patterns, categories, max_score = _scan(text)
+    max_severity = _SEVERITY_BY_SCORE[max_score]
+
+    is_harassment = max_severity in _HARASSMENT_SEVERITIES
 
     # Calculate confidence based on number of matches
     match_count = len(matched_patterns)
@@ -134,20 +319,21 @@ def detect_harassment(text: str) -> HarassmentResult:
     else:
         confidence = 0.95
 
-    # Generate recommendation
-    recommendations = {
-        Severity.CRITICAL: "即座に上席者へエスカレーション。通話録音を保存し、法務部門に報告してください。",
-        Severity.HIGH: "冷静に対応し、上席者への引き継ぎを準備してください。対応履歴を詳細に記録してください。",
-        Severity.MEDIUM: "落ち着いたトーンで対応を継続。感情的にならず、事実ベースで回答してください。",
-        Severity.LOW: "通常対応を継続。お客様の不満に寄り添いながら解決策を提示してください。",
-        Severity.NONE: "通常対応を継続してください。",
-    }
-
     return HarassmentResult(
         is_harassment=is_harassment,
         severity=max_severity,
         confidence=confidence,
-        matched_patterns=matched_patterns,
-        categories=sorted(categories),
-        recommendation=recommendations[max_severity],
+        matched_patterns=tuple(matched_patterns),
+        categories=tuple(categories),
+        recommendation=_RECOMMENDATIONS[max_severity],
     )
+
+
+def detect_harassment_batch(texts: list[str]) -> list[HarassmentResult]:
+    """
+    Detect harassment in many texts (analytics / backfill).
+
+    A convenience wrapper: detect_harassment's cache already makes repeated
+    texts in a batch share one scan and one result object.
+    """
+    return [detect_harassment(text) for text in texts]
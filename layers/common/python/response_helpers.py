@@ -3,8 +3,14 @@ Shared Lambda response helpers.
 Standard JSON response formatting with CORS headers.
 """
 import json
+from datetime import datetime, timezone
 from typing import Any, Optional
 
+try:
+    import orjson  # optional: native JSON encoder/decoder
+except ImportError:
+    orjson = None
+
 
 CORS_HEADERS = {
     "Content-Type": "application/json",
@@ -13,13 +19,28 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
 }
 
+# Compact JSON: no whitespace after "," and ":" in response bodies
+JSON_SEPARATORS = (",", ":")
+
+
+def _dumps(body: Any) -> str:
+    """Serialize a response body to compact, non-ASCII-escaped JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(body, default=str).decode()
+        except TypeError:
+            # orjson rejects ints beyond 64 bits and non-str dict keys, e.g. in
+            # free-form AI analysis; the json module handles both
+            pass
+    return json.dumps(body, ensure_ascii=False, default=str, separators=JSON_SEPARATORS)
+
 
 def success_response(body: Any, status_code: int = 200) -> dict:
     """Return a successful API Gateway proxy response."""
     return {
         "statusCode": status_code,
         "headers": CORS_HEADERS,
-        "body": json.dumps(body, ensure_ascii=False, default=str),
+        "body": _dumps(body),
     }
 
 
@@ -31,10 +52,15 @@ def error_response(message: str, status_code: int = 400, details: Optional[dict]
     return {
         "statusCode": status_code,
         "headers": CORS_HEADERS,
-        "body": json.dumps(body, ensure_ascii=False),
+        "body": _dumps(body),
     }
 
 
+def utc_now_iso() -> str:
+    """Return the current UTC time as an ISO 8601 string (millisecond precision)."""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
 def parse_body(event: dict) -> Optional[dict]:
     """Parse JSON body from API Gateway event, returning None on failure."""
     body = event.get("body")
@@ -42,7 +68,8 @@ def parse_body(event: dict) -> Optional[dict]:
         return None
     if isinstance(body, str):
         try:
-            return json.loads(body)
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            return orjson.loads(body) if orjson is not None else json.loads(body)
         except json.JSONDecodeError:
             return None
     return body
@@ -5,9 +5,16 @@ Detects: positive, neutral, negative, anger — with confidence scores.
 """
 import re
 import logging
+from functools import lru_cache
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+try:
+    import ahocorasick  # optional: pyahocorasick
+except ImportError:
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
@@ -19,21 +26,21 @@ class Sentiment(str, Enum):
     ANGER = "anger"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SentimentResult:
     sentiment: Sentiment
     confidence: float
-    scores: dict[str, float]  # { positive: 0.1, neutral: 0.2, negative: 0.3, anger: 0.4 }
+    scores: Mapping[str, float]  # { positive: 0.1, neutral: 0.2, negative: 0.3, anger: 0.4 }
     trigger_alert: bool       # True if anger detected → dashboard alert
-    keywords_found: list[str]
+    keywords_found: tuple[str, ...]
 
     def to_dict(self) -> dict:
         return {
             "sentiment": self.sentiment.value,
             "confidence": self.confidence,
-            "scores": self.scores,
+            "scores": dict(self.scores),
             "trigger_alert": self.trigger_alert,
-            "keywords_found": self.keywords_found,
+            "keywords_found": list(self.keywords_found),
         }
 
 
@@ -64,36 +71,97 @@ ANGER_KEYWORDS = [
 ]
 
 
-def _count_matches(text: str, keywords: list[str]) -> tuple[int, list[str]]:
-    """Count keyword matches and return (count, matched_keywords)."""
-    found = []
-    text_lower = text.lower()
-    for kw in keywords:
-        if kw.lower() in text_lower:
-            found.append(kw)
-    return len(found), found
+# Keyword lists case-folded once at import
+_POS_LC = [kw.lower() for kw in POSITIVE_KEYWORDS]
+_NEG_LC = [kw.lower() for kw in NEGATIVE_KEYWORDS]
+_ANG_LC = [kw.lower() for kw in ANGER_KEYWORDS]
 
 
-def analyze_sentiment(text: str) -> SentimentResult:
+_CATEGORY_KEYWORDS = (_POS_LC, _NEG_LC, _ANG_LC)
+
+
+def _compile_keywords(keywords_lc: list[str]) -> tuple[re.Pattern, dict[str, int], dict[str, tuple[str, ...]]]:
     """
-    Analyze sentiment of the given text.
+    Compile a keyword list into one alternation, longest keyword first.
 
-    Returns SentimentResult with scores for each sentiment category.
-    Triggers alert if anger is detected (for dashboard notification).
+    Returns (pattern, order, contained): the pattern matches the longest
+    keyword starting at a position, ``contained`` maps it to every keyword
+    it contains (shorter ones at the same position are hidden by it), and
+    ``order`` restores keyword-list order.
     """
-    if not text or not text.strip():
-        return SentimentResult(
-            sentiment=Sentiment.NEUTRAL,
-            confidence=1.0,
-            scores={"positive": 0.0, "neutral": 1.0, "negative": 0.0, "anger": 0.0},
-            trigger_alert=False,
-            keywords_found=[],
-        )
+    longest_first = sorted(keywords_lc, key=len, reverse=True)
+    pattern = re.compile("|".join(map(re.escape, longest_first)))
+    order = {kw: i for i, kw in reversed(list(enumerate(keywords_lc)))}
+    contained = {kw: tuple(other for other in order if other in kw) for kw in order}
+    return pattern, order, contained
+
+
+# One compiled matcher per category, used when pyahocorasick is unavailable
+_KEYWORD_MATCHERS = tuple(_compile_keywords(keywords) for keywords in _CATEGORY_KEYWORDS)
+
+
+def _count_matches(text_lower: str, matcher: tuple) -> tuple[int, list[str]]:
+    """Count keyword matches in lowercased text and return (count, matched_keywords)."""
+    pattern, order, contained = matcher
+    m = pattern.search(text_lower)
+    if m is None:
+        return 0, []
+    hits = set()
+    # Resume one character after each match start so overlapping keywords
+    # are found exactly like per-keyword substring checks
+    while m:
+        hits.update(contained[m.group()])
+        m = pattern.search(text_lower, m.start() + 1)
+    found = sorted(hits, key=order.__getitem__)
+    return len(found), found
+
+
+def _build_automaton():
+    """Build one Aho–Corasick automaton over all keyword lists."""
+    hits: dict[str, list[tuple[int, int]]] = {}
+    for category, keywords in enumerate(_CATEGORY_KEYWORDS):
+        for index, kw in enumerate(keywords):
+            hits.setdefault(kw, []).append((category, index))
+    automaton = ahocorasick.Automaton()
+    for key, value in hits.items():
+        automaton.add_word(key, tuple(value))
+    automaton.make_automaton()
+    return automaton
+
+
+# Finds every keyword in one pass over the text; None without pyahocorasick
+_AUTOMATON = _build_automaton() if ahocorasick is not None else None
+
+
+def _find_keywords(text_lower: str) -> tuple[list[str], list[str], list[str]]:
+    """Return the (positive, negative, anger) keywords found, in keyword-list order."""
+    if _AUTOMATON is None:
+        return tuple(_count_matches(text_lower, matcher)[1] for matcher in _KEYWORD_MATCHERS)
 
-    pos_count, pos_found = _count_matches(text, POSITIVE_KEYWORDS)
-    neg_count, neg_found = _count_matches(text, NEGATIVE_KEYWORDS)
-    ang_count, ang_found = _count_matches(text, ANGER_KEYWORDS)
+    hits = set()
+    for _, value in _AUTOMATON.iter(text_lower):
+        hits.update(value)
+    found = ([], [], [])
+    for category, index in sorted(hits):
+        found[category].append(_CATEGORY_KEYWORDS[category][index])
+    return found
 
+
+# Sentiments that the exclamation boost applies to
+_NEG_OR_ANGER = frozenset({Sentiment.NEGATIVE, Sentiment.ANGER})
+
+
+@lru_cache(maxsize=1024)
+def _score(
+    pos_count: int, neg_count: int, ang_count: int, boosted: bool
+) -> tuple[Sentiment, float, tuple[float, float, float, float]]:
+    """
+    Pick the dominant sentiment and scores from keyword counts.
+
+    Pure function of small ints, so results are memoized. ``boosted`` is
+    True when the text has 3+ exclamation marks. Returns (dominant,
+    confidence, (positive, neutral, negative, anger) scores).
+    """
     total = pos_count + neg_count + ang_count + 1  # +1 for neutral base
 
     # Calculate raw scores
@@ -103,8 +171,6 @@ def analyze_sentiment(text: str) -> SentimentResult:
     neu_score = 1 / total
 
     # Determine dominant sentiment
-    all_found = pos_found + neg_found + ang_found
-
     if ang_count >= 2 or (ang_count >= 1 and neg_count >= 1):
         # Strong anger signal
         dominant = Sentiment.ANGER
@@ -128,30 +194,76 @@ def analyze_sentiment(text: str) -> SentimentResult:
         dominant = Sentiment.NEUTRAL
         confidence = 0.8
 
-    # Punctuation boosters (!! → more intense)
-    exclamation_count = text.count("!") + text.count("！")
-    if exclamation_count >= 3 and dominant in (Sentiment.NEGATIVE, Sentiment.ANGER):
+    if boosted and dominant in _NEG_OR_ANGER:
         confidence = min(0.98, confidence + 0.1)
         ang_score += 0.1
 
     # Normalize scores
     score_total = pos_score + neg_score + ang_score + neu_score
     if score_total > 0:
-        scores = {
-            "positive": round(pos_score / score_total, 3),
-            "neutral": round(neu_score / score_total, 3),
-            "negative": round(neg_score / score_total, 3),
-            "anger": round(ang_score / score_total, 3),
-        }
+        scores = (
+            round(pos_score / score_total, 3),
+            round(neu_score / score_total, 3),
+            round(neg_score / score_total, 3),
+            round(ang_score / score_total, 3),
+        )
     else:
-        scores = {"positive": 0.0, "neutral": 1.0, "negative": 0.0, "anger": 0.0}
+        scores = (0.0, 1.0, 0.0, 0.0)
+
+    return dominant, round(confidence, 3), scores
+
+
+# Shared result for empty / whitespace-only input (read-only)
+_EMPTY_RESULT = SentimentResult(
+    sentiment=Sentiment.NEUTRAL,
+    confidence=1.0,
+    scores=MappingProxyType({"positive": 0.0, "neutral": 1.0, "negative": 0.0, "anger": 0.0}),
+    trigger_alert=False,
+    keywords_found=(),
+)
 
-    trigger_alert = dominant == Sentiment.ANGER
+
+@lru_cache(maxsize=4096)
+def analyze_sentiment(text: str) -> SentimentResult:
+    """
+    Analyze sentiment of the given text.
+
+    Returns SentimentResult with scores for each sentiment category.
+    Triggers alert if anger is detected (for dashboard notification).
+
+    Results are memoized per text (repeated boilerplate messages are common)
+    and shared between callers, so scores and keywords are read-only views.
+    """
+    if not text or text.isspace():
+        return _EMPTY_RESULT
+
+    pos_found, neg_found, ang_found = _find_keywords(text.lower())
+    pos_count, neg_count, ang_count = len(pos_found), len(neg_found), len(ang_found)
+
+    all_found = pos_found + neg_found + ang_found
+
+    # Punctuation boosters (!! → more intense). Only NEGATIVE/ANGER results
+    # (anger keywords, or more negative than positive) are boosted, so other
+    # text skips the exclamation scans.
+    boosted = False
+    if ang_count or neg_count > pos_count:
+        boosted = text.count("!") + text.count("！") >= 3
+    dominant, confidence, (pos, neu, neg, ang) = _score(pos_count, neg_count, ang_count, boosted)
 
     return SentimentResult(
         sentiment=dominant,
-        confidence=round(confidence, 3),
-        scores=scores,
-        trigger_alert=trigger_alert,
-        keywords_found=all_found,
+        confidence=confidence,
+        scores=MappingProxyType({"positive": pos, "neutral": neu, "negative": neg, "anger": ang}),
+        trigger_alert=dominant == Sentiment.ANGER,
+        keywords_found=tuple(all_found),
     )
+
+
+def analyze_sentiment_batch(texts: list[str]) -> list[SentimentResult]:
+    """
+    Analyze sentiment of many texts (analytics / backfill).
+
+    A convenience wrapper: analyze_sentiment's cache already makes repeated
+    texts in a batch share one analysis and one result object.
+    """
+    return [analyze_sentiment(text) for text in texts]
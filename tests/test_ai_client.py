@@ -0,0 +1,175 @@
+"""
+Unit tests for the shared Claude client helpers.
+Tests the streaming time budget with a fake client (no network).
+"""
+import sys
+import os
+import time
+import threading
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+import ai_client
+from ai_client import StreamTimeoutError, TTLCache, stream_text
+
+
+class FakeStream:
+    """Yields chunks, then stalls at ``stall_at`` until closed."""
+
+    def __init__(self, chunks: list[str], stall_at: int, raise_on_close: bool = True):
+        self.chunks = chunks
+        self.stall_at = stall_at
+        self.raise_on_close = raise_on_close
+        self.closed = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        self.closed.set()
+
+    @property
+    def text_stream(self):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.stall_at:
+                assert self.closed.wait(5), "stream was never aborted"
+                if self.raise_on_close:
+                    raise RuntimeError("response closed")
+                return
+            yield chunk
+
+
+class FakeClient:
+    """Records how stream_text calls the SDK."""
+
+    def __init__(self, stream: FakeStream):
+        self.stream_obj = stream
+        self.options = None
+        self.timeout = None
+        self.messages = self
+
+    def with_options(self, **options):
+        self.options = options
+        return self
+
+    def stream(self, timeout, **params):
+        self.timeout = timeout
+        return self.stream_obj
+
+
+@pytest.fixture(autouse=True)
+def plain_timeout(monkeypatch):
+    """Skip building an httpx.Timeout; record the budget as a tuple instead."""
+    monkeypatch.setattr(ai_client, "_stream_timeout", lambda idle, total: (idle, total))
+
+
+class TestStreamText:
+    """Test the dead-man and total timeouts of stream_text."""
+
+    def test_returns_concatenated_text(self):
+        client = FakeClient(FakeStream(["こんにちは", "、", "お待たせしました"], stall_at=-1))
+        assert stream_text(client, model="m") == "こんにちは、お待たせしました"
+
+    def test_disables_sdk_retries(self):
+        client = FakeClient(FakeStream(["ok"], stall_at=-1))
+        stream_text(client, idle_timeout=10.0, total_timeout=20.0)
+        assert client.options == {"max_retries": 0}
+        assert client.timeout == (10.0, 20.0)
+
+    def test_stall_before_first_chunk_aborts_at_deadline(self):
+        client = FakeClient(FakeStream(["never sent"], stall_at=0))
+        start = time.monotonic()
+        with pytest.raises(StreamTimeoutError):
+            stream_text(client, idle_timeout=10.0, total_timeout=0.05)
+        assert time.monotonic() - start < 1.0
+
+    def test_stall_between_chunks_aborts_at_deadline(self):
+        client = FakeClient(FakeStream(["途中", "never sent"], stall_at=1, raise_on_close=False))
+        start = time.monotonic()
+        with pytest.raises(StreamTimeoutError):
+            stream_text(client, idle_timeout=10.0, total_timeout=0.05)
+        assert time.monotonic() - start < 1.0
+
+    def test_other_errors_propagate(self):
+        class BrokenStream(FakeStream):
+            @property
+            def text_stream(self):
+                raise ValueError("bad event")
+                yield
+
+        client = FakeClient(BrokenStream([], stall_at=-1))
+        with pytest.raises(ValueError):
+            stream_text(client)
+
+    def test_http_timeout_capped_by_total_budget(self, monkeypatch):
+        httpx = pytest.importorskip("httpx")
+        monkeypatch.undo()
+        timeout = ai_client._stream_timeout(10.0, 4.0)
+        assert isinstance(timeout, httpx.Timeout)
+        assert timeout.read == 4.0
+        assert timeout.connect == ai_client.STREAM_CONNECT_TIMEOUT_SECONDS
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ai_client.time, "monotonic", fake)
+    return fake
+
+
+class TestTTLCache:
+    """Test expiry and LRU eviction of TTLCache."""
+
+    def test_get_missing(self, clock):
+        assert TTLCache(maxsize=2, ttl=60).get("missing") is None
+
+    def test_entry_expires_after_ttl(self, clock):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", "A")
+        clock.now += 59.9
+        assert cache.get("a") == "A"
+        clock.now += 0.1
+        assert cache.get("a") is None
+        assert len(cache._data) == 0  # expired entries are dropped on read
+
+    def test_set_refreshes_expiry(self, clock):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", "A")
+        clock.now += 50
+        cache.set("a", "A2")
+        clock.now += 50
+        assert cache.get("a") == "A2"
+
+    def test_evicts_least_recently_set(self, clock):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.set("c", "C")
+        assert cache.get("a") is None
+        assert cache.get("b") == "B"
+        assert cache.get("c") == "C"
+
+    def test_get_marks_entry_recently_used(self, clock):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        assert cache.get("a") == "A"
+        cache.set("c", "C")
+        assert cache.get("a") == "A"
+        assert cache.get("b") is None
+        assert cache.get("c") == "C"
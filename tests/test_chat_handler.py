@@ -0,0 +1,58 @@
+"""
+Unit tests for the chat Lambda handler.
+Tests the rule-based vs Claude response branch without a database.
+"""
+import sys
+import os
+import json
+import importlib.util
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+_APP_PATH = os.path.join(os.path.dirname(__file__), '..', 'functions', 'chat', 'app.py')
+_spec = importlib.util.spec_from_file_location("chat_app", _APP_PATH)
+chat_app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(chat_app)
+
+
+@pytest.fixture
+def ai_calls(monkeypatch):
+    """Stub out Claude and the DB writer; collect messages sent to Claude."""
+    calls = []
+
+    def fake_ai_response(message, conversation_history):
+        calls.append(message)
+        return "AI response"
+
+    monkeypatch.setattr(chat_app, "_generate_ai_response", fake_ai_response)
+    monkeypatch.setattr(chat_app, "_persist_turn", lambda *args: None)
+    monkeypatch.setattr(chat_app, "flush_writes", lambda *args: True)
+    return calls
+
+
+def _chat(message: str) -> dict:
+    event = {"body": json.dumps({"message": message, "conversation_id": "conv-1"})}
+    response = chat_app.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    return json.loads(response["body"])
+
+
+class TestChatResponseBranch:
+    """Test when the handler answers from rules instead of calling Claude."""
+
+    def test_confident_rule_match_skips_claude(self, ai_calls):
+        body = _chat("配送が遅い")
+        assert ai_calls == []
+        assert body["response"] == chat_app.RESPONSE_RULES[0][1]
+
+    @pytest.mark.parametrize("message", ["nothing works", "Which one?"])
+    def test_keyword_inside_word_calls_claude(self, ai_calls, message):
+        body = _chat(message)
+        assert ai_calls == [message]
+        assert body["response"] == "AI response"
+
+    def test_whole_word_ascii_keyword_skips_claude(self, ai_calls):
+        body = _chat("hi")
+        assert ai_calls == []
+        assert body["response"].startswith("こんにちは")
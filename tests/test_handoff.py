@@ -34,6 +34,15 @@ class TestHandoffContext:
         ctx = build_handoff_context("conv-1", messages)
         assert len(ctx.order_numbers) >= 1
 
+    def test_extract_each_order_number_format(self):
+        messages = self._make_messages([
+            ("user", "注文番号 ORD-001 と order#ORD-002 について"),
+            ("assistant", "確認いたします"),
+            ("user", "Order No. ORD-003 もです"),
+        ])
+        ctx = build_handoff_context("conv-1", messages)
+        assert ctx.order_numbers == ["ORD-001", "ORD-002", "ORD-003"]
+
     # ── Issue extraction ──────────────────────────────────────────────────
 
     def test_detect_shipping_issue(self):
@@ -64,6 +73,13 @@ class TestHandoffContext:
         ctx = build_handoff_context("conv-1", messages)
         assert "料金問題" in ctx.detected_issues
 
+    def test_detect_overlapping_issues(self):
+        messages = self._make_messages([
+            ("user", "返事がないし、商品も届かない"),
+        ])
+        ctx = build_handoff_context("conv-1", messages)
+        assert ctx.detected_issues == ["配送問題", "対応不満"]
+
     # ── Priority determination ────────────────────────────────────────────
 
     def test_critical_priority_for_critical_harassment(self):
@@ -9,7 +9,8 @@ import pytest
 # Add layer to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
 
-from harassment_detector import detect_harassment, Severity
+import harassment_detector
+from harassment_detector import detect_harassment, detect_harassment_batch, Severity
 
 
 class TestHarassmentDetector:
@@ -106,6 +107,11 @@ class TestHarassmentDetector:
         assert result.is_harassment is False
         assert result.severity == Severity.NONE
 
+    def test_ascii_message(self):
+        result = detect_harassment("Where is my order? SNS support please!!!")
+        assert result.is_harassment is False
+        assert result.severity == Severity.NONE
+
     def test_empty_message(self):
         result = detect_harassment("")
         assert result.is_harassment is False
@@ -138,6 +144,18 @@ class TestHarassmentDetector:
         assert "recommendation" in d
         assert isinstance(d["severity"], str)
 
+    def test_to_dict_does_not_leak_cached_state(self):
+        d = detect_harassment("バカ野郎").to_dict()
+        d["categories"].append("tampered")
+        d["matched_patterns"].clear()
+        fresh = detect_harassment("バカ野郎").to_dict()
+        assert fresh["categories"] == ["insult_baka"]
+        assert fresh["matched_patterns"]
+
+        empty = detect_harassment("").to_dict()
+        empty["categories"].append("tampered")
+        assert detect_harassment("").to_dict()["categories"] == []
+
 
 class TestHarassmentEdgeCases:
     """Test edge cases and combined patterns."""
@@ -147,6 +165,22 @@ class TestHarassmentEdgeCases:
         result = detect_harassment("バカ！殺すぞ！困る！")
         assert result.severity == Severity.CRITICAL  # "殺す" is critical
 
+    def test_critical_keeps_medium_and_low_matches(self):
+        """MEDIUM/LOW matches are still reported (and counted) alongside CRITICAL."""
+        result = detect_harassment("バカ！殺すぞ！今すぐ！困る！")
+        assert result.severity == Severity.CRITICAL
+        assert result.categories == ("death_threat", "insult_baka", "urgency_pressure", "frustration")
+        assert result.confidence == 0.95
+
+    def test_critical_with_demands_and_threats(self):
+        result = detect_harassment("殺すぞ、今すぐ金返せ、SNSで晒す")
+        assert result.severity == Severity.CRITICAL
+        assert result.categories == (
+            "death_threat", "urgency_pressure", "compensation_demand", "social_media_threat",
+        )
+        assert len(result.matched_patterns) == 4
+        assert result.confidence == 0.95
+
     def test_katakana_detection(self):
         result = detect_harassment("コロス")
         assert result.severity == Severity.CRITICAL
@@ -162,3 +196,45 @@ class TestHarassmentEdgeCases:
     def test_recommendation_for_high(self):
         result = detect_harassment("バカ")
         assert "引き継ぎ" in result.recommendation or "上席" in result.recommendation
+
+    def test_batch_results(self):
+        texts = ["バカ", "殺すぞ", "", "バカ", "注文番号を教えてください"]
+        results = detect_harassment_batch(texts)
+        assert [r.severity for r in results] == [
+            Severity.HIGH, Severity.CRITICAL, Severity.NONE, Severity.HIGH, Severity.NONE,
+        ]
+        assert [r.categories for r in results] == [
+            ("insult_baka",), ("death_threat",), (), ("insult_baka",), (),
+        ]
+        assert results[0] is results[3]
+
+    @pytest.mark.parametrize("text", [
+        "お前を殺すぞ",
+        "バカ！殺すぞ！今すぐ！困る！",
+        "部長を出せ、殺すぞ",
+        "ゴミクズみたいな対応、SNSで晒す",
+        "責任者を出せ、何度も言ってる",
+        "説明が分かりにくいし遅い",
+        "注文番号を教えてください",
+        "Where is my order?",
+        "SNS",
+    ])
+    def test_generated_scanner_matches_generic(self, text):
+        assert harassment_detector._scan_fast(text) == harassment_detector._scan_generic(text)
+
+    @pytest.mark.parametrize("source, expected", [
+        ("殺す|ころす", True),
+        ("(バカ)?です", True),
+        ("x*殺", True),
+        ("[ぁ-ん]", True),
+        (r"\w殺", True),
+        ("(?:a|死)ね", True),
+        ("[(]|殺", False),  # the class matches ASCII "("
+        ("[^殺]", False),
+        ("(バカ)?", False),
+        ("(殺){0,2}", False),
+        ("sns|ネット", False),
+        ("\u212a", False),  # KELVIN SIGN matches "k" case-insensitively
+    ])
+    def test_requires_non_ascii(self, source, expected):
+        assert harassment_detector._requires_non_ascii(source) is expected
@@ -0,0 +1,82 @@
+"""
+Unit tests for the health check Lambda handler.
+Tests caching of the Claude API probe without network access.
+"""
+import sys
+import os
+import importlib.util
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+_APP_PATH = os.path.join(os.path.dirname(__file__), '..', 'functions', 'health', 'app.py')
+_spec = importlib.util.spec_from_file_location("health_app", _APP_PATH)
+health_app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(health_app)
+
+
+class FakeClient:
+    """Counts probe calls; raises while ``error`` is set."""
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+        self.messages = self
+
+    def create(self, **params):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def probe(monkeypatch):
+    """Fresh probe cache, a fake client and a controllable monotonic clock."""
+    client = FakeClient()
+    clock = {"now": 1000.0}
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setattr(health_app, "get_client", lambda: client)
+    monkeypatch.setattr(health_app.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(health_app, "_ai_health_cache", {"checked_at": 0.0, "result": None})
+    return client, clock
+
+
+class TestAiHealthProbe:
+    """Test the cached Claude API health probe."""
+
+    def test_unconfigured_without_api_key(self, monkeypatch):
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        assert health_app._check_ai_api()["status"] == "unconfigured"
+
+    def test_healthy_probe_is_cached(self, probe):
+        client, clock = probe
+        first = health_app._check_ai_api()
+        clock["now"] += 30
+        second = health_app._check_ai_api()
+        assert first["status"] == "healthy" and "cached" not in first
+        assert second["status"] == "healthy" and second["cached"] is True
+        assert client.calls == 1
+
+    def test_cache_expires_after_ttl(self, probe):
+        client, clock = probe
+        health_app._check_ai_api()
+        clock["now"] += health_app.AI_HEALTH_CACHE_TTL_SECONDS
+        result = health_app._check_ai_api()
+        assert "cached" not in result
+        assert client.calls == 2
+
+    def test_failure_clears_cache(self, probe):
+        client, clock = probe
+        health_app._check_ai_api()
+        clock["now"] += health_app.AI_HEALTH_CACHE_TTL_SECONDS
+        client.error = RuntimeError("connection refused")
+        failed = health_app._check_ai_api()
+        assert failed == {"status": "unhealthy", "provider": "anthropic", "error": "connection refused"}
+        assert health_app._ai_health_cache["result"] is None
+
+        # Failures are not cached: the next check probes again
+        client.error = None
+        clock["now"] += 1
+        result = health_app._check_ai_api()
+        assert result["status"] == "healthy" and "cached" not in result
+        assert client.calls == 3
@@ -0,0 +1,87 @@
+"""
+Unit tests for the log writer Lambda handler.
+Tests batching and per-row fallback without a database.
+"""
+import sys
+import os
+import json
+import importlib.util
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+_APP_PATH = os.path.join(os.path.dirname(__file__), '..', 'functions', 'log_writer', 'app.py')
+_spec = importlib.util.spec_from_file_location("log_writer_app", _APP_PATH)
+log_writer_app = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(log_writer_app)
+
+
+def _record(message_id: str, **overrides) -> dict:
+    row = {
+        "conversation_id": "conv-1",
+        "message_text": "テスト",
+        "harassment_severity": "none",
+        "sentiment": "neutral",
+        "combined_risk": "low",
+        "ai_enhanced": False,
+        "created_at": "2026-01-01T00:00:00+00:00",
+    }
+    row.update(overrides)
+    return {"messageId": message_id, "body": json.dumps(row)}
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    """Replace the DB insert; rows whose message_text is "bad" raise DataError."""
+    calls = []
+
+    def fake_insert(query, rows, page_size=100):
+        calls.append(list(rows))
+        if any(row[1] == "bad" for row in rows):
+            raise psycopg2.DataError("invalid input")
+
+    monkeypatch.setattr(log_writer_app, "execute_values_insert", fake_insert)
+    return calls
+
+
+class TestLogWriter:
+    """Test the SQS batch handler."""
+
+    def test_writes_batch_in_one_insert(self, inserts):
+        result = log_writer_app.lambda_handler({"Records": [_record("m1"), _record("m2")]}, None)
+        assert result == {"batchItemFailures": []}
+        assert len(inserts) == 1
+        assert [row[0] for row in inserts[0]] == ["conv-1", "conv-1"]
+
+    def test_malformed_records_are_dropped(self, inserts):
+        records = [
+            {"messageId": "m1", "body": "not json"},
+            {"messageId": "m2", "body": json.dumps({"conversation_id": "conv-1"})},
+            _record("m3"),
+        ]
+        result = log_writer_app.lambda_handler({"Records": records}, None)
+        assert result == {"batchItemFailures": []}
+        assert len(inserts) == 1 and len(inserts[0]) == 1
+
+    def test_bad_row_reported_alone(self, inserts):
+        records = [_record("m1"), _record("m2", message_text="bad"), _record("m3")]
+        result = log_writer_app.lambda_handler({"Records": records}, None)
+        assert result == {"batchItemFailures": [{"itemIdentifier": "m2"}]}
+        assert len(inserts) == 4  # batch, then one insert per row
+
+    def test_connection_failure_fails_whole_batch(self, monkeypatch):
+        calls = []
+
+        def unreachable(query, rows, page_size=100):
+            calls.append(rows)
+            raise psycopg2.OperationalError("could not connect to server")
+
+        monkeypatch.setattr(log_writer_app, "execute_values_insert", unreachable)
+        with pytest.raises(psycopg2.OperationalError):
+            log_writer_app.lambda_handler({"Records": [_record("m1"), _record("m2")]}, None)
+        assert len(calls) == 1  # no per-row retries
+
+    def test_empty_event(self, inserts):
+        assert log_writer_app.lambda_handler({}, None) == {"batchItemFailures": []}
+        assert inserts == []
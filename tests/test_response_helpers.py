@@ -0,0 +1,46 @@
+"""
+Unit tests for the shared response helpers.
+Tests JSON body serialization with and without orjson.
+"""
+import sys
+import os
+import json
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
+
+import response_helpers
+from response_helpers import error_response, success_response
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Run each test with orjson (if installed) and with the json fallback."""
+    if request.param == "json":
+        monkeypatch.setattr(response_helpers, "orjson", None)
+    elif response_helpers.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+class TestResponseBody:
+    """Test response body serialization."""
+
+    def test_compact_unescaped_json(self, encoder):
+        response = success_response({"message": "こんにちは", "score": 1})
+        assert response["body"] == '{"message":"こんにちは","score":1}'
+        assert response["statusCode"] == 200
+
+    def test_error_details(self, encoder):
+        response = error_response("bad request", details={"field": "message"})
+        assert json.loads(response["body"]) == {"error": "bad request", "details": {"field": "message"}}
+        assert response["statusCode"] == 400
+
+    def test_integer_beyond_64_bits(self, encoder):
+        score = 123456789012345678901234567890
+        response = success_response({"ai_analysis": {"score": score}})
+        assert json.loads(response["body"]) == {"ai_analysis": {"score": score}}
+
+    def test_non_string_keys(self, encoder):
+        response = success_response({"ai_analysis": {1: "one", None: "none"}})
+        assert json.loads(response["body"]) == {"ai_analysis": {"1": "one", "null": "none"}}
@@ -8,7 +8,8 @@ import pytest
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'layers', 'common', 'python'))
 
-from sentiment_analyzer import analyze_sentiment, Sentiment
+import sentiment_analyzer
+from sentiment_analyzer import analyze_sentiment, analyze_sentiment_batch, Sentiment
 
 
 class TestSentimentAnalyzer:
@@ -101,9 +102,82 @@ class TestSentimentAnalyzer:
         assert "keywords_found" in d
         assert isinstance(d["sentiment"], str)
 
+    def test_to_dict_does_not_leak_cached_state(self):
+        d = analyze_sentiment("ありがとう").to_dict()
+        d["scores"]["anger"] = 1.0
+        d["keywords_found"].append("tampered")
+        fresh = analyze_sentiment("ありがとう").to_dict()
+        assert fresh["scores"]["anger"] == 0.0
+        assert fresh["keywords_found"] == ["ありがとう"]
+
+        empty = analyze_sentiment("").to_dict()
+        empty["scores"]["neutral"] = 0.0
+        assert analyze_sentiment("").to_dict()["scores"]["neutral"] == 1.0
+
+    def test_keywords_match_case_insensitively(self):
+        result = analyze_sentiment("Thanks, GREAT support")
+        assert result == analyze_sentiment("thanks, great support")
+        assert result.sentiment == Sentiment.POSITIVE
+
     # ── Exclamation boost test ────────────────────────────────────────────
 
     def test_exclamation_boosts_anger(self):
         result_calm = analyze_sentiment("最悪")
         result_excited = analyze_sentiment("最悪！！！！！")
         assert result_excited.confidence >= result_calm.confidence
+
+    # ── Batch API ─────────────────────────────────────────────────────────
+
+    def test_batch_results(self):
+        texts = ["ありがとう", "ふざけるな", "", "ありがとう", "遅い", "注文について"]
+        results = analyze_sentiment_batch(texts)
+        assert [r.sentiment for r in results] == [
+            Sentiment.POSITIVE, Sentiment.ANGER, Sentiment.NEUTRAL,
+            Sentiment.POSITIVE, Sentiment.NEGATIVE, Sentiment.NEUTRAL,
+        ]
+        assert [r.keywords_found for r in results] == [
+            ("ありがとう",), ("ふざけるな",), (), ("ありがとう",), ("遅い",), (),
+        ]
+        assert results[0] is results[3]
+
+    # ── Regex fallback (used without pyahocorasick) ───────────────────────
+
+    @pytest.mark.parametrize("text", [
+        "いい加減にしろ",
+        "thank you",
+        "thanks, thank you!",
+        "ブチギレてる、キレそう",
+        "困って困る、不便で不満",
+        "いい加減にして、ありえない最悪",
+        "最悪最悪",
+        "注文について",
+        "",
+    ])
+    def test_regex_fallback_matches_keyword_scan(self, text):
+        text_lower = text.lower()
+        fallback = tuple(
+            sentiment_analyzer._count_matches(text_lower, matcher)[1]
+            for matcher in sentiment_analyzer._KEYWORD_MATCHERS
+        )
+        expected = tuple(
+            [kw for kw in keywords if kw in text_lower]
+            for keywords in sentiment_analyzer._CATEGORY_KEYWORDS
+        )
+        assert fallback == expected
+        assert fallback == tuple(sentiment_analyzer._find_keywords(text_lower))
+
+    @pytest.mark.parametrize("text", [
+        "thank you",
+        "thank you, thank",
+        "you thank",
+        "abcd",
+        "xbcdx abc",
+        "no match",
+    ])
+    def test_regex_fallback_overlapping_keywords(self, text):
+        """Keywords nested in or overlapping a longer match are all found, in list order."""
+        keywords = ["you", "thank you", "bcd", "thank", "ank yo", "abc"]
+        matcher = sentiment_analyzer._compile_keywords(keywords)
+        count, found = sentiment_analyzer._count_matches(text, matcher)
+        assert found == [kw for kw in keywords if kw in text]
+        assert count == len(found)